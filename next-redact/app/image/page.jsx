@@ -26,11 +26,32 @@ const CardContent = ({ className, children }) => (
   </div>
 );
 
+// File extension for each format the redaction API can return
+const REDACTED_EXTENSIONS = {
+  'image/png': 'png',
+  'image/jpeg': 'jpg',
+  'image/tiff': 'tiff',
+  'application/pdf': 'pdf',
+};
+
+// Formats an <img> can show; TIFF and PDF results are download-only
+const PREVIEWABLE_TYPES = ['image/png', 'image/jpeg', 'image/gif', 'image/webp'];
+
+const NoPreview = ({ extension }) => (
+  <div className="w-full h-48 flex items-center justify-center rounded-lg bg-gray-100 text-sm text-gray-500 text-center p-4">
+    {extension ? `No preview for ${extension.toUpperCase()} files.` : 'No preview available.'}
+  </div>
+);
+
 const ImageRedactor = () => {
   const [isUploading, setIsUploading] = useState(false);
   const [isProcessing, setIsProcessing] = useState(false);
   const [originalImage, setOriginalImage] = useState(null);
+  const [originalType, setOriginalType] = useState('');
   const [redactedImage, setRedactedImage] = useState(null);
+  const [redactedType, setRedactedType] = useState('');
+  const [redactedFileName, setRedactedFileName] = useState('redacted-image.png');
+  const [outputFormat, setOutputFormat] = useState('tiff');
 
   const handleImageUpload = async (event) => {
     const file = event.target.files[0];
@@ -41,10 +62,13 @@ const ImageRedactor = () => {
 
     // Create object URL for preview
     setOriginalImage(URL.createObjectURL(file));
+    setOriginalType(file.type);
 
     // Prepare form data
     const formData = new FormData();
     formData.append('image', file);
+    // Only used for multi-page TIFF and animated GIF/WebP/PNG uploads
+    formData.append('output_format', outputFormat);
 
     try {
       setIsProcessing(true);
@@ -57,6 +81,8 @@ const ImageRedactor = () => {
       if (!response.ok) throw new Error('Failed to process image');
 
       const blob = await response.blob();
+      setRedactedType(blob.type);
+      setRedactedFileName(`redacted-image.${REDACTED_EXTENSIONS[blob.type] || 'png'}`);
       setRedactedImage(URL.createObjectURL(blob));
     } catch (error) {
       console.error('Error processing image:', error);
@@ -71,7 +97,7 @@ const ImageRedactor = () => {
 
     const link = document.createElement('a');
     link.href = redactedImage;
-    link.download = 'redacted-image.png';
+    link.download = redactedFileName;
     document.body.appendChild(link);
     link.click();
     document.body.removeChild(link);
@@ -110,7 +136,7 @@ const ImageRedactor = () => {
                 <p className="mb-2 text-sm text-gray-500">
                   <span className="font-semibold">Click to upload</span> or drag and drop
                 </p>
-                <p className="text-xs text-gray-500">PNG, JPG or JPEG (MAX. 10MB)</p>
+                <p className="text-xs text-gray-500">PNG, JPG, TIFF, GIF or WebP (MAX. 10MB)</p>
               </div>
               <input
                 type="file"
@@ -122,27 +148,52 @@ const ImageRedactor = () => {
             </label>
           </div>
 
+          {/* Multi-page Output Format */}
+          <div className="flex items-center justify-between text-sm">
+            <label htmlFor="output-format" className="font-medium">
+              Output for multi-page and animated images
+            </label>
+            <select
+              id="output-format"
+              value={outputFormat}
+              onChange={(event) => setOutputFormat(event.target.value)}
+              disabled={isProcessing}
+              className="border rounded-lg px-2 py-1"
+            >
+              <option value="tiff">TIFF</option>
+              <option value="pdf">PDF</option>
+            </select>
+          </div>
+
           {/* Preview Section */}
           {(originalImage || redactedImage) && (
             <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
               {originalImage && (
                 <div className="space-y-2">
                   <p className="text-sm font-medium">Original Image</p>
-                  <img
-                    src={originalImage}
-                    alt="Original"
-                    className="w-full h-48 object-cover rounded-lg"
-                  />
+                  {PREVIEWABLE_TYPES.includes(originalType) ? (
+                    <img
+                      src={originalImage}
+                      alt="Original"
+                      className="w-full h-48 object-cover rounded-lg"
+                    />
+                  ) : (
+                    <NoPreview extension={REDACTED_EXTENSIONS[originalType]} />
+                  )}
                 </div>
               )}
               {redactedImage && (
                 <div className="space-y-2">
                   <p className="text-sm font-medium">Redacted Image</p>
-                  <img
-                    src={redactedImage}
-                    alt="Redacted"
-                    className="w-full h-48 object-cover rounded-lg"
-                  />
+                  {PREVIEWABLE_TYPES.includes(redactedType) ? (
+                    <img
+                      src={redactedImage}
+                      alt="Redacted"
+                      className="w-full h-48 object-cover rounded-lg"
+                    />
+                  ) : (
+                    <NoPreview extension={REDACTED_EXTENSIONS[redactedType]} />
+                  )}
                 </div>
               )}
             </div>
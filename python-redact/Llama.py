@@ -5,12 +5,15 @@ from flask_cors import CORS
 from io import BytesIO
 import pdfplumber
 import tempfile
+from cascades import checkout_cascades, reserve_cascades
+from image_encoding import IMAGE_OUTPUTS
+from multiframe import (MULTI_FRAME_EXTENSIONS, is_animated_png,
+                        redact_multiframe_image)
 import requests
 import json
 import ast
 import requests
 import pytesseract
-from PIL import Image
 import spacy
 import io
 import re
@@ -25,10 +28,7 @@ CORS(app)
 nlp = spacy.load("en_core_web_sm")
 
 # Load pre-trained models
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-body_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + 'haarcascade_fullbody.xml')
+reserve_cascades(1)
 
 # Initialize YOLO for logo detection
 
@@ -45,46 +45,51 @@ def initialize_yolo():
     return net, output_layers
 
 
-def detect_and_redact_objects(image):
+def paint_redactions(buffers, boxes):
     """
-    Detect and redact faces, human figures, and logos in the image
+    Paint black boxes in place on every buffer (BGR image and grayscale copy)
     """
-    # Convert PIL Image to OpenCV format
-    opencv_img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    gray = cv2.cvtColor(opencv_img, cv2.COLOR_BGR2GRAY)
+    for (x, y, w, h) in boxes:
+        for buffer in buffers:
+            cv2.rectangle(buffer, (x, y), (x+w, y+h), (0, 0, 0), -1)
+
 
-    # Detect faces
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(30, 30)
-    )
-
-    # Detect bodies
-    bodies = body_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(30, 30)
-    )
+def detect_and_redact_objects(opencv_img, gray):
+    """
+    Detect and redact faces, human figures, and logos in place on the BGR image
+    and its grayscale copy
+    """
+    with checkout_cascades() as (face_cascade, body_cascade):
+        # Detect faces
+        faces = face_cascade.detectMultiScale(
+            gray,
+            scaleFactor=1.1,
+            minNeighbors=5,
+            minSize=(30, 30)
+        )
+
+        # Detect bodies
+        bodies = body_cascade.detectMultiScale(
+            gray,
+            scaleFactor=1.1,
+            minNeighbors=5,
+            minSize=(30, 30)
+        )
 
     # Redact detected faces
-    for (x, y, w, h) in faces:
-        cv2.rectangle(opencv_img, (x, y), (x+w, y+h), (0, 0, 0), -1)
+    paint_redactions((opencv_img, gray), faces)
 
     # Redact detected bodies
-    for (x, y, w, h) in bodies:
-        cv2.rectangle(opencv_img, (x, y), (x+w, y+h), (0, 0, 0), -1)
+    paint_redactions((opencv_img, gray), bodies)
 
     # Logo detection using template matching
     # This is a simplified approach - for better logo detection,
     # you might want to use a more sophisticated method or train a custom model
-    gray = cv2.cvtColor(opencv_img, cv2.COLOR_BGR2GRAY)
     edges = cv2.Canny(gray, 50, 200)
     contours, _ = cv2.findContours(
         edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
+    logos = []
     for contour in contours:
         # Filter contours that might be logos (you may need to adjust these parameters)
         if cv2.contourArea(contour) > 1000 and cv2.contourArea(contour) < 50000:
@@ -92,20 +97,17 @@ def detect_and_redact_objects(image):
             aspect_ratio = float(w)/h
             # Logos often have specific aspect ratios
             if 0.5 <= aspect_ratio <= 2.0:
-                cv2.rectangle(opencv_img, (x, y), (x+w, y+h), (0, 0, 0), -1)
+                logos.append((x, y, w, h))
 
-    # Convert back to PIL Image
-    redacted_image = Image.fromarray(
-        cv2.cvtColor(opencv_img, cv2.COLOR_BGR2RGB))
-    return redacted_image
+    paint_redactions((opencv_img, gray), logos)
 
 
-def perform_ocr(image) -> str:
+def perform_ocr(gray) -> str:
     """
-    Perform OCR on the input image
+    Perform OCR on the grayscale image buffer
     """
     try:
-        text = pytesseract.image_to_string(image)
+        text = pytesseract.image_to_string(gray)
         return text
     except Exception as e:
         raise Exception(f"OCR failed: {str(e)}")
@@ -136,25 +138,20 @@ def get_entities_for_redaction(text: str) -> List[Tuple[str, int, int]]:
     return entities
 
 
-def redact_text_in_image(image, text: str, entities: List[Tuple[str, int, int]]):
+def redact_text_in_image(opencv_img, gray, text: str, entities: List[Tuple[str, int, int]]):
     """
-    Redact text entities in the image
+    Redact text entities in place on the BGR image and its grayscale copy
     """
-    opencv_img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-
-    d = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    d = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
 
+    boxes = []
     for i, word in enumerate(d['text']):
         for entity_text, _, _ in entities:
             if word and word in entity_text:
-                x = d['left'][i]
-                y = d['top'][i]
-                w = d['width'][i]
-                h = d['height'][i]
-                cv2.rectangle(opencv_img, (x, y),
-                              (x + w, y + h), (0, 0, 0), -1)
+                boxes.append((d['left'][i], d['top'][i],
+                              d['width'][i], d['height'][i]))
 
-    return Image.fromarray(cv2.cvtColor(opencv_img, cv2.COLOR_BGR2RGB))
+    paint_redactions((opencv_img, gray), boxes)
 
 
 def combine_entity_tokens(entities):
@@ -197,6 +194,18 @@ def combine_entity_tokens(entities):
     return combined
 
 
+def redact_frame(opencv_img):
+    """
+    Run object, OCR and entity redaction in place on a single BGR frame
+    """
+    gray = cv2.cvtColor(opencv_img, cv2.COLOR_BGR2GRAY)
+    detect_and_redact_objects(opencv_img, gray)
+    extracted_text = perform_ocr(gray)
+    entities = get_entities_for_redaction(extracted_text)
+    redact_text_in_image(opencv_img, gray, extracted_text, entities)
+    return opencv_img
+
+
 @app.route('/api/redact_image', methods=['POST'])
 def redact():
     try:
@@ -205,31 +214,37 @@ def redact():
 
         image_file = request.files['image']
 
-        if not image_file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-            return jsonify({'error': 'Invalid file format. Only PNG, JPG, and JPEG are allowed'}), 400
+        extension = os.path.splitext(image_file.filename.lower())[1]
+        if extension in MULTI_FRAME_EXTENSIONS or (
+                extension == '.png' and is_animated_png(image_file)):
+            return redact_multiframe_image(
+                image_file, request.form.get('output_format', 'tiff'),
+                redact_frame, initializer=reserve_cascades)
 
-        # Open image
-        image = Image.open(image_file)
+        if extension not in ('.png', '.jpg', '.jpeg'):
+            return jsonify({'error': 'Invalid file format. Only PNG, JPG, JPEG, TIFF, GIF, and WebP are allowed'}), 400
+        extension = '.jpg' if extension == '.jpeg' else extension
 
-        # First, redact faces, humans, and logos
-        image = detect_and_redact_objects(image)
+        # Decode straight into the BGR buffer shared by every stage
+        opencv_img = cv2.imdecode(np.frombuffer(
+            image_file.read(), np.uint8), cv2.IMREAD_COLOR)
+        if opencv_img is None:
+            return jsonify({'error': 'Could not decode image'}), 400
 
-        # Then perform OCR and redact text entities
-        extracted_text = perform_ocr(image)
-        entities = get_entities_for_redaction(extracted_text)
-        final_redacted_image = redact_text_in_image(
-            image, extracted_text, entities)
+        # Redact objects and text entities in place
+        redact_frame(opencv_img)
 
-        # Save redacted image to bytes
-        img_byte_arr = io.BytesIO()
-        final_redacted_image.save(img_byte_arr, format=image.format or 'PNG')
-        img_byte_arr.seek(0)
+        # Encode redacted image in the input format
+        mimetype, encode_params = IMAGE_OUTPUTS[extension]
+        success, encoded = cv2.imencode(extension, opencv_img, encode_params)
+        if not success:
+            raise Exception("Image encoding failed")
 
         return send_file(
-            img_byte_arr,
-            mimetype='image/png',
+            io.BytesIO(encoded),
+            mimetype=mimetype,
             as_attachment=True,
-            download_name='redacted_image.png'
+            download_name=f'redacted_image{extension}'
         )
 
     except Exception as e:
@@ -0,0 +1,203 @@
+"""
+Microbenchmark for the image redaction glue code.
+
+Compares the old PIL <-> OpenCV round trips in /api/redact_image with the
+single BGR ndarray pipeline. Detection, OCR and NER are identical in both
+paths and are left out. Decode, buffer conversions and encode are timed
+separately, and encode is compared against a same-format baseline so a
+format change is not reported as a conversion saving. Copies are measured
+by checking whether each conversion shares its source buffer.
+
+Usage: python benchmark_pipeline.py [--width 2480] [--height 3508] [--format .jpg]
+"""
+import argparse
+import io
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from image_encoding import IMAGE_OUTPUTS, JPEG_QUALITY
+
+PIL_FORMATS = {'.png': 'PNG', '.jpg': 'JPEG'}
+
+
+def allocates_buffer(result, source) -> bool:
+    """
+    Tell whether a conversion step copied pixels instead of sharing its
+    source buffer
+    """
+    if isinstance(result, Image.Image):
+        # Image.fromarray maps matching buffers read-only instead of copying
+        return not result.readonly
+    if isinstance(source, Image.Image):
+        # Pillow pixel storage is never shared with numpy arrays
+        return True
+    return not np.shares_memory(result, source)
+
+
+class CopyCounter:
+    """
+    Counts conversion steps that allocate a new pixel buffer
+    """
+
+    def __init__(self):
+        self.copies = 0
+
+    def __call__(self, result, source):
+        if allocates_buffer(result, source):
+            self.copies += 1
+        return result
+
+
+def make_test_image(width: int, height: int, extension: str) -> bytes:
+    """
+    Build an encoded scan-like test image with text and blocks
+    """
+    canvas = np.full((height, width, 3), 245, np.uint8)
+    for y in range(80, height - 80, 60):
+        cv2.putText(canvas, "John Smith, 221B Baker Street, London", (60, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, (20, 20, 20), 2)
+    cv2.rectangle(canvas, (width // 3, height // 3),
+                  (width // 2, height // 2), (90, 120, 200), -1)
+    _, encoded = cv2.imencode(extension, canvas)
+    return encoded.tobytes()
+
+
+def legacy_decode(data: bytes):
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def legacy_convert(image, copy: CopyCounter):
+    """
+    Conversion chain of the original route: RGB/BGR and PIL/ndarray round
+    trips in every stage
+    """
+    # detect_and_redact_objects
+    array = copy(np.array(image), image)
+    opencv_img = copy(cv2.cvtColor(array, cv2.COLOR_RGB2BGR), array)
+    copy(cv2.cvtColor(opencv_img, cv2.COLOR_BGR2GRAY), opencv_img)
+    rgb = copy(cv2.cvtColor(opencv_img, cv2.COLOR_BGR2RGB), opencv_img)
+    image = copy(Image.fromarray(rgb), rgb)
+
+    # redact_text_in_image (Tesseract takes the PIL image as is)
+    array = copy(np.array(image), image)
+    opencv_img = copy(cv2.cvtColor(array, cv2.COLOR_RGB2BGR), array)
+    rgb = copy(cv2.cvtColor(opencv_img, cv2.COLOR_BGR2RGB), opencv_img)
+    return copy(Image.fromarray(rgb), rgb)
+
+
+def legacy_route_encode(image, extension: str) -> bytes:
+    """
+    What the original route did: image.format was lost after the first
+    stage, so every output was PNG at Pillow's default level
+    """
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return output.getvalue()
+
+
+def pil_encode(image, extension: str) -> bytes:
+    """
+    Same-format baseline: Pillow encoding the input format at the same
+    JPEG quality
+    """
+    output = io.BytesIO()
+    image.save(output, format=PIL_FORMATS[extension], quality=JPEG_QUALITY)
+    return output.getvalue()
+
+
+def ndarray_decode(data: bytes):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def ndarray_convert(opencv_img, copy: CopyCounter):
+    """
+    Conversion chain of the ndarray route: one grayscale buffer shared with
+    Tesseract
+    """
+    gray = copy(cv2.cvtColor(opencv_img, cv2.COLOR_BGR2GRAY), opencv_img)
+
+    # pytesseract wraps ndarrays in a PIL image for image_to_string and
+    # image_to_data
+    copy(Image.fromarray(gray), gray)
+    copy(Image.fromarray(gray), gray)
+    return opencv_img
+
+
+def ndarray_encode(opencv_img, extension: str) -> bytes:
+    _, encoded = cv2.imencode(extension, opencv_img,
+                              IMAGE_OUTPUTS[extension][1])
+    return encoded.tobytes()
+
+
+def best_ms(step, *args, repeat: int):
+    """
+    Run a step repeatedly, returning (best ms, last result)
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = step(*args)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--width', type=int, default=2480)
+    parser.add_argument('--height', type=int, default=3508)
+    parser.add_argument('--format', default='.jpg', choices=IMAGE_OUTPUTS)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = make_test_image(args.width, args.height, args.format)
+    megapixels = args.width * args.height / 1e6
+    repeat = args.repeat
+
+    legacy_copies, ndarray_copies = CopyCounter(), CopyCounter()
+    image = legacy_convert(legacy_decode(data), legacy_copies)
+    opencv_img = ndarray_convert(ndarray_decode(data), ndarray_copies)
+
+    legacy_decode_ms, _ = best_ms(legacy_decode, data, repeat=repeat)
+    ndarray_decode_ms, _ = best_ms(ndarray_decode, data, repeat=repeat)
+    legacy_convert_ms, _ = best_ms(
+        legacy_convert, image, CopyCounter(), repeat=repeat)
+    ndarray_convert_ms, _ = best_ms(
+        ndarray_convert, opencv_img, CopyCounter(), repeat=repeat)
+    route_encode_ms, route_output = best_ms(
+        legacy_route_encode, image, args.format, repeat=repeat)
+    pil_encode_ms, pil_output = best_ms(
+        pil_encode, image, args.format, repeat=repeat)
+    ndarray_encode_ms, ndarray_output = best_ms(
+        ndarray_encode, opencv_img, args.format, repeat=repeat)
+
+    def report(stage: str, label: str, ms: float, output: bytes = None):
+        size = f", {len(output)} bytes" if output is not None else ""
+        print(f"{stage:8s} {label:30s} {ms:8.1f} ms "
+              f"{ms / megapixels:7.1f} ms/MP{size}")
+
+    print(f"{args.width}x{args.height} ({megapixels:.1f} MP), input {args.format}")
+    report('decode', 'legacy (PIL)', legacy_decode_ms)
+    report('decode', 'ndarray (cv2)', ndarray_decode_ms)
+    report('convert', f'legacy, {legacy_copies.copies} copies',
+           legacy_convert_ms)
+    report('convert', f'ndarray, {ndarray_copies.copies} copies',
+           ndarray_convert_ms)
+    report('encode', 'legacy route (always PNG)', route_encode_ms, route_output)
+    report('encode', 'PIL, same format', pil_encode_ms, pil_output)
+    report('encode', 'cv2, same format, fast flags', ndarray_encode_ms,
+           ndarray_output)
+
+    print(f"copy removal saves {legacy_copies.copies - ndarray_copies.copies} "
+          f"copies, {(legacy_convert_ms - ndarray_convert_ms) / megapixels:.1f} ms/MP")
+    print(f"fast-path encode saves "
+          f"{(pil_encode_ms - ndarray_encode_ms) / megapixels:.1f} ms/MP "
+          f"against the same-format baseline")
+
+
+if __name__ == '__main__':
+    main()
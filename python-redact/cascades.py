@@ -0,0 +1,62 @@
+"""
+Pool of Haar cascade classifiers shared by the redaction servers.
+
+detectMultiScale keeps per-image scale data inside the classifier, so one
+classifier must never be used by two threads at once. Loading the XML files
+costs tens of milliseconds, so request threads and frame workers borrow a
+(face, body) pair from this pool instead of loading their own.
+"""
+import threading
+from contextlib import contextmanager
+
+import cv2
+
+_lock = threading.Lock()
+_idle = []
+_loaded = 0
+
+
+def load_cascades():
+    """
+    Load a (face, body) cascade pair
+    """
+    return (
+        cv2.CascadeClassifier(
+            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'),
+        cv2.CascadeClassifier(
+            cv2.data.haarcascades + 'haarcascade_fullbody.xml'),
+    )
+
+
+def reserve_cascades(count: int):
+    """
+    Preload pairs until the pool holds at least count of them; used as the
+    frame executor initializer so workers never load on the first page
+    """
+    global _loaded
+    with _lock:
+        while _loaded < count:
+            _idle.append(load_cascades())
+            _loaded += 1
+
+
+@contextmanager
+def checkout_cascades():
+    """
+    Borrow a (face, body) cascade pair for the duration of the block,
+    loading a new one only when every pair is in use
+    """
+    global _loaded
+    with _lock:
+        pair = _idle.pop() if _idle else None
+        if pair is None:
+            _loaded += 1
+
+    if pair is None:
+        pair = load_cascades()
+
+    try:
+        yield pair
+    finally:
+        with _lock:
+            _idle.append(pair)
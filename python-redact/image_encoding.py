@@ -0,0 +1,43 @@
+"""
+Output encoding settings shared by the redaction servers and the benchmark
+"""
+import logging
+import os
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JPEG_QUALITY = 90
+
+
+def read_jpeg_quality() -> int:
+    """
+    Read REDACT_JPEG_QUALITY, falling back to the default when it is not an
+    integer and clamping it to the 0-100 range accepted by OpenCV
+    """
+    value = os.environ.get('REDACT_JPEG_QUALITY')
+    if value is None:
+        return DEFAULT_JPEG_QUALITY
+
+    try:
+        quality = int(value)
+    except ValueError:
+        logger.warning("REDACT_JPEG_QUALITY=%r is not an integer, using %d",
+                       value, DEFAULT_JPEG_QUALITY)
+        return DEFAULT_JPEG_QUALITY
+
+    clamped = min(max(quality, 0), 100)
+    if clamped != quality:
+        logger.warning("REDACT_JPEG_QUALITY=%d is outside 0-100, using %d",
+                       quality, clamped)
+    return clamped
+
+
+# Output encoding keeps the input format and favours encode speed over size
+JPEG_QUALITY = read_jpeg_quality()
+IMAGE_OUTPUTS = {
+    '.png': ('image/png', [cv2.IMWRITE_PNG_COMPRESSION, 1]),
+    '.jpg': ('image/jpeg', [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY,
+                            cv2.IMWRITE_JPEG_OPTIMIZE, 0]),
+}
@@ -0,0 +1,265 @@
+"""
+Multi-page image redaction shared by the redaction servers.
+
+Frames are decoded lazily, redacted in parallel with the server's own
+redact_frame, and written back one page at a time as a TIFF or PDF.
+"""
+import io
+import os
+import struct
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+from flask import jsonify, send_file
+from PIL import Image, ImageSequence, TiffImagePlugin
+
+# Multi-page scans and image sequences are redacted frame by frame on a
+# small thread pool. APNG shares the .png extension and is detected by content
+MULTI_FRAME_EXTENSIONS = ('.tif', '.tiff', '.gif', '.webp')
+FRAME_WORKERS = min(4, os.cpu_count() or 1)
+PDF_PAGES_PER_SAVE = 16
+
+# Pages in these modes keep their mode on output; everything else becomes RGB
+GRAY_MODES = ('1', 'L')
+LOSSLESS_TIFF_COMPRESSIONS = (
+    'raw', 'packbits', 'tiff_lzw', 'tiff_deflate', 'tiff_adobe_deflate')
+BILEVEL_TIFF_COMPRESSIONS = ('group3', 'group4', 'tiff_ccitt')
+
+# Errors Pillow raises for truncated or malformed frames, including while
+# seeking to a later page of a damaged file
+FRAME_DECODE_ERRORS = (OSError, ValueError, TypeError, SyntaxError, struct.error)
+
+
+class FrameDecodeError(Exception):
+    """
+    Raised when a page of a multi-page upload cannot be decoded
+    """
+
+
+def is_animated_png(image_file) -> bool:
+    """
+    Tell whether a PNG upload is an APNG, rewinding the stream afterwards
+    """
+    try:
+        with Image.open(image_file) as image:
+            return getattr(image, 'is_animated', False)
+    except FRAME_DECODE_ERRORS:
+        return False
+    finally:
+        image_file.seek(0)
+
+
+def frame_to_bgr(frame):
+    """
+    Copy a PIL frame out into a BGR ndarray
+    """
+    if frame.mode in GRAY_MODES:
+        return cv2.cvtColor(np.asarray(frame.convert('L')), cv2.COLOR_GRAY2BGR)
+    return cv2.cvtColor(np.asarray(frame.convert('RGB')), cv2.COLOR_RGB2BGR)
+
+
+def bgr_to_image(opencv_img):
+    """
+    Wrap a BGR ndarray as an RGB PIL image, swapping channels while unpacking
+    """
+    height, width = opencv_img.shape[:2]
+    return Image.frombuffer('RGB', (width, height), opencv_img, 'raw', 'BGR', 0, 1)
+
+
+def redact_page(redact_frame, opencv_img, mode: str):
+    """
+    Redact a BGR page and hand it back as a PIL image in its source mode,
+    so bilevel and grayscale scans are not re-encoded as RGB
+    """
+    redact_frame(opencv_img)
+    if mode not in GRAY_MODES:
+        return bgr_to_image(opencv_img)
+
+    page = Image.fromarray(cv2.cvtColor(opencv_img, cv2.COLOR_BGR2GRAY))
+    if mode == '1':
+        # Redaction boxes are pure black, so a plain threshold is lossless
+        page = page.convert('1', dither=Image.Dither.NONE)
+    return page
+
+
+def tiff_compression(mode: str, compression: str) -> str:
+    """
+    Keep the source TIFF compression when it can encode the page, otherwise
+    fall back to deflate
+    """
+    if compression in LOSSLESS_TIFF_COMPRESSIONS:
+        return compression
+    if compression in BILEVEL_TIFF_COMPRESSIONS and mode == '1':
+        return compression
+    return 'tiff_deflate'
+
+
+def frame_dpi(frame):
+    """
+    Return the frame's (x, y) resolution in dpi, or None when it has none
+    """
+    dpi = frame.info.get('dpi')
+    if not dpi or min(dpi) <= 0:
+        return None
+    return float(dpi[0]), float(dpi[1])
+
+
+def iter_decoded_frames(image):
+    """
+    Decode frames one at a time into (BGR ndarray, mode, compression, dpi),
+    raising FrameDecodeError for a truncated or malformed page
+    """
+    frames = ImageSequence.Iterator(image)
+    page_number = 0
+    while True:
+        page_number += 1
+        try:
+            frame = next(frames)
+            mode = frame.mode if frame.mode in GRAY_MODES else 'RGB'
+            # Only TIFF frames carry a compression; sequences get deflate
+            compression = frame.info.get('compression', 'tiff_deflate')
+            # Copy the frame out before the iterator seeks to the next one
+            opencv_img = frame_to_bgr(frame)
+        except StopIteration:
+            return
+        except FRAME_DECODE_ERRORS as e:
+            raise FrameDecodeError(f'page {page_number}: {e}') from e
+
+        yield opencv_img, mode, compression, frame_dpi(frame)
+
+
+def iter_redacted_frames(image, redact_frame, max_workers: int = FRAME_WORKERS,
+                         initializer=None):
+    """
+    Lazily decode the frames of a multi-frame image and redact them in parallel.
+    At most 2 * max_workers frames are in flight; (page, compression, dpi)
+    tuples are yielded in page order. initializer, if given, is called with
+    max_workers in each worker thread.
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers, initializer=initializer,
+                            initargs=(max_workers,)) as executor:
+        try:
+            for opencv_img, mode, compression, dpi in iter_decoded_frames(image):
+                job = executor.submit(redact_page, redact_frame, opencv_img, mode)
+                pending.append((job, compression, dpi))
+                if len(pending) >= max_workers * 2:
+                    job, compression, dpi = pending.popleft()
+                    yield job.result(), compression, dpi
+        except FrameDecodeError:
+            # Drop queued pages instead of redacting them for nothing
+            for job, _, _ in pending:
+                job.cancel()
+            raise
+
+        while pending:
+            job, compression, dpi = pending.popleft()
+            yield job.result(), compression, dpi
+
+
+def write_multipage_tiff(frames, output_path: str):
+    """
+    Write frames to a multi-page TIFF, appending one page at a time
+    """
+    with TiffImagePlugin.AppendingTiffWriter(output_path, new=True) as tiff:
+        for page, compression, dpi in frames:
+            page.save(tiff, format='TIFF', dpi=dpi,
+                      compression=tiff_compression(page.mode, compression))
+            tiff.newFrame()
+
+
+def flush_pdf_pages(pdf_document, output_path: str):
+    """
+    Write pending pages to output_path and reopen it, so pages already on
+    disk are no longer held in memory
+    """
+    if pdf_document.name:
+        pdf_document.saveIncr()
+    else:
+        pdf_document.save(output_path, deflate=True)
+    pdf_document.close()
+    return fitz.open(output_path)
+
+
+def write_multipage_pdf(frames, output_path: str):
+    """
+    Write frames to a PDF, one page per frame sized from its resolution,
+    saving incrementally every PDF_PAGES_PER_SAVE pages
+    """
+    pdf_document = fitz.open()
+
+    for page_number, (page, _, dpi) in enumerate(frames, start=1):
+        encoded = io.BytesIO()
+        page.save(encoded, format='PNG', compress_level=1)
+        # PDF pages are measured in points; frames without a resolution
+        # fall back to 72 dpi, one point per pixel
+        x_dpi, y_dpi = dpi or (72, 72)
+        pdf_page = pdf_document.new_page(width=page.width * 72 / x_dpi,
+                                         height=page.height * 72 / y_dpi)
+        pdf_page.insert_image(pdf_page.rect, stream=encoded.getvalue())
+
+        if page_number % PDF_PAGES_PER_SAVE == 0:
+            pdf_document = flush_pdf_pages(pdf_document, output_path)
+
+    flush_pdf_pages(pdf_document, output_path).close()
+
+
+# Output format -> (mimetype, file suffix, writer)
+MULTI_FRAME_OUTPUTS = {
+    'tiff': ('image/tiff', '.tiff', write_multipage_tiff),
+    'pdf': ('application/pdf', '.pdf', write_multipage_pdf),
+}
+
+
+def redact_multiframe_image(image_file, output_format: str, redact_frame,
+                            initializer=None):
+    """
+    Redact every frame of a multi-page or animated image with redact_frame
+    and stream the result back as a multi-page TIFF or PDF
+    """
+    output_format = output_format.lower()
+    if output_format not in MULTI_FRAME_OUTPUTS:
+        return jsonify({'error': 'Invalid output format. Only tiff and pdf are allowed'}), 400
+
+    mimetype, suffix, writer = MULTI_FRAME_OUTPUTS[output_format]
+
+    image = None
+    try:
+        image = Image.open(image_file)
+        # Walk every page header and decode the first page up front, so most
+        # damaged files are rejected before any redaction runs
+        getattr(image, 'n_frames', 1)
+        image.load()
+    except FRAME_DECODE_ERRORS:
+        if image is not None:
+            image.close()
+        return jsonify({'error': 'Could not decode image'}), 400
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_output:
+        output_path = temp_output.name
+
+    try:
+        with image:
+            frames = iter_redacted_frames(image, redact_frame,
+                                          initializer=initializer)
+            writer(frames, output_path)
+
+    except FrameDecodeError:
+        return jsonify({'error': 'Could not decode image'}), 400
+
+    else:
+        return send_file(
+            output_path,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=f'redacted_image{suffix}'
+        )
+
+    finally:
+        # Clean up temporary file
+        if os.path.exists(output_path):
+            os.unlink(output_path)